@@ -0,0 +1,56 @@
+"""
+Optimizer defaults and schedules of base pretraining. scripts/base_train.py and the autotune worker
+(scripts/autotune_worker.py) both train through here, so tuning trials train exactly like real runs.
+"""
+
+import torch
+
+# Default optimizer settings (the scripts expose them as command line overridable globals)
+embedding_lr = 0.2 # learning rate for the embedding parameters (Adam)
+unembedding_lr = 0.004 # learning rate for the unembedding parameters (Adam)
+weight_decay = 0.0 # weight decay for the embedding/unembedding parameters (Adam)
+matrix_lr = 0.02 # learning rate for the matrix parameters (Muon)
+grad_clip = 1.0 # gradient clipping value (0.0 = disabled)
+warmup_ratio = 0.0 # ratio of iterations for LR warmup
+warmdown_ratio = 0.2 # ratio of iterations for LR warmdown
+final_lr_frac = 0.0 # final LR is this fraction of the initial LR
+
+# Learning rate scheduler
+def get_lr_multiplier(it, num_iterations, warmup_ratio=warmup_ratio, warmdown_ratio=warmdown_ratio, final_lr_frac=final_lr_frac):
+    warmup_iters = round(warmup_ratio * num_iterations)
+    warmdown_iters = round(warmdown_ratio * num_iterations)
+    if it < warmup_iters:
+        return (it + 1) / warmup_iters
+    elif it <= num_iterations - warmdown_iters:
+        return 1.0
+    else:
+        progress = (num_iterations - it) / warmdown_iters
+        return progress * 1.0 + (1 - progress) * final_lr_frac
+
+# Momentum scheduler for Muon optimizer
+def get_muon_momentum(it):
+    frac = min(it / 300, 1)
+    momentum = (1 - frac) * 0.85 + frac * 0.95
+    return momentum
+
+def step_optimizers(model, optimizers, it, num_iterations, grad_clip=grad_clip, warmup_ratio=warmup_ratio, warmdown_ratio=warmdown_ratio, final_lr_frac=final_lr_frac):
+    """
+    Apply the accumulated gradients of iteration `it`: clip, set the scheduled LR and Muon momentum,
+    step the (adamw, muon) optimizers and clear the gradients. Returns the LR multiplier used.
+    """
+    # gradient clipping (TODO possibly experiment with)
+    if grad_clip > 0.0:
+        torch.nn.utils.clip_grad_norm_(model.parameters(), grad_clip)
+    # step the optimizers
+    lrm = get_lr_multiplier(it, num_iterations, warmup_ratio, warmdown_ratio, final_lr_frac)
+    for opt in optimizers:
+        for group in opt.param_groups:
+            group["lr"] = group["initial_lr"] * lrm
+    adamw_optimizer, muon_optimizer = optimizers
+    muon_momentum = get_muon_momentum(it)
+    for group in muon_optimizer.param_groups:
+        group["momentum"] = muon_momentum
+    for opt in optimizers:
+        opt.step()
+    model.zero_grad(set_to_none=True)
+    return lrm
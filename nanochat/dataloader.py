@@ -6,8 +6,12 @@ from nanochat.common import get_dist_info
 from nanochat.dataset import parquets_iter_batched
 from nanochat.tokenizer import get_tokenizer
 
-def tokenizing_distributed_data_loader(B, T, split, tokenizer_threads=4, tokenizer_batch_size=128, device="cuda"):
-    """Stream pretraining text from parquet files, tokenize, yield training batches."""
+def tokenizing_distributed_data_loader_with_state(B, T, split, tokenizer_threads=4, tokenizer_batch_size=128, device="cuda", resume_state=None):
+    """
+    Stream pretraining text from parquet files, tokenize, yield (inputs, targets, state) training batches.
+    state is the loader position at the start of that batch; passing it back as resume_state
+    restarts the stream at exactly that batch, without re-tokenizing the documents before it.
+    """
     assert split in ["train", "val"], "split must be 'train' or 'val'"
     ddp, ddp_rank, ddp_local_rank, ddp_world_size = get_dist_info()
     needed_tokens = B * T + 1 # +1 is because we also need the target at the last token
@@ -16,28 +20,49 @@ def tokenizing_distributed_data_loader(B, T, split, tokenizer_threads=4, tokeniz
     bos_token = tokenizer.get_bos_token_id()
     # scratch buffer holds the tokens for one iteration
     token_buffer = deque() # we stream tokens on the right and pop from the left
+    # position of the buffer's first token: index of its document batch, and tokens of that batch already used
+    resume_state = resume_state or {"doc_batch": 0, "offset": 0}
+    doc_batch, offset = resume_state["doc_batch"], resume_state["offset"]
+    buffered_lengths = deque() # token count of each document batch that is (partly) in the buffer
 
-    # infinite iterator over document batches
-    def document_batches():
+    # infinite iterator over document batches, skipping the ones consumed before resume_state
+    def document_batches(skip):
         while True:
             # batch will iterate in group size of the parquet files, usually e.g. 1024 rows
             for batch in parquets_iter_batched(split=split, start=ddp_rank, step=ddp_world_size):
                 # for the tokenizer we might want to go in usually smaller batches, e.g. 128 rows
                 for i in range(0, len(batch), tokenizer_batch_size):
+                    if skip > 0:
+                        skip -= 1
+                        continue
                     yield batch[i:i+tokenizer_batch_size]
-    batches = document_batches()
+    batches = document_batches(doc_batch)
 
-    batch_index = 0
+    to_drop = offset # tokens of the first document batch that were used before resume_state
     while True:
         # Accumulate enough tokens for one iteration before yielding.
-        while len(token_buffer) < needed_tokens:
-            doc_batch = next(batches)
-            token_lists = tokenizer.encode(doc_batch, prepend=bos_token, num_threads=tokenizer_threads)
+        while len(token_buffer) < needed_tokens + to_drop:
+            doc_batch_texts = next(batches)
+            token_lists = tokenizer.encode(doc_batch_texts, prepend=bos_token, num_threads=tokenizer_threads)
+            buffered_lengths.append(sum(len(tokens) for tokens in token_lists))
             for tokens in token_lists:
                 token_buffer.extend(tokens)
-            batch_index += 1
+        for _ in range(to_drop):
+            token_buffer.popleft()
+        to_drop = 0
+        state = {"doc_batch": doc_batch, "offset": offset}
         # Move tokens from the deque into the scratch buffer
         tokens = [token_buffer.popleft() for _ in range(needed_tokens)]
+        # Advance the position past the tokens just taken
+        remaining = needed_tokens
+        while remaining > 0:
+            available = buffered_lengths[0] - offset
+            if available > remaining:
+                offset += remaining
+                break
+            remaining -= available
+            buffered_lengths.popleft()
+            doc_batch, offset = doc_batch + 1, 0
         # CUDA supports memory pinning for faster transfers between CPU and GPU:
         scratch = torch.tensor(tokens, dtype=torch.int64, pin_memory=(device == "cuda"))
         # Create the inputs/targets as 1D tensors
@@ -46,4 +71,27 @@ def tokenizing_distributed_data_loader(B, T, split, tokenizer_threads=4, tokeniz
         # Reshape to 2D and move to GPU async
         inputs = inputs_cpu.view(B, T).to(device=device, dtype=torch.int32, non_blocking=True)
         targets = targets_cpu.view(B, T).to(device=device, dtype=torch.int64, non_blocking=True)
+        yield inputs, targets, state
+
+def tokenizing_distributed_data_loader(*args, **kwargs):
+    """Stream pretraining text from parquet files, tokenize, yield training batches."""
+    for inputs, targets, state in tokenizing_distributed_data_loader_with_state(*args, **kwargs):
+        yield inputs, targets
+
+def pretokenized_data_loader(B, T, path, device="cuda"):
+    """Yield batches from a token tensor saved by `python -m nanochat.dataset --prepare-eval`."""
+    ddp, ddp_rank, ddp_local_rank, ddp_world_size = get_dist_info()
+    needed_tokens = B * T + 1 # same batch layout as tokenizing_distributed_data_loader
+    # memory-mapped, so processes reading the same file (e.g. in /dev/shm) share its pages
+    tokens = torch.load(path, mmap=True, weights_only=True)
+    # ranks take turns on consecutive batches
+    for start in range(ddp_rank * needed_tokens, len(tokens) - needed_tokens + 1, ddp_world_size * needed_tokens):
+        scratch = tokens[start:start+needed_tokens].to(dtype=torch.int64)
+        if device == "cuda":
+            scratch = scratch.pin_memory()
+        inputs_cpu = scratch[:-1].to(dtype=torch.int32)
+        targets_cpu = scratch[1:]
+        inputs = inputs_cpu.view(B, T).to(device=device, dtype=torch.int32, non_blocking=True)
+        targets = targets_cpu.view(B, T).to(device=device, dtype=torch.int64, non_blocking=True)
         yield inputs, targets
+    raise ValueError(f"Ran out of tokens in {path}, prepare it with a larger --eval-tokens")
@@ -108,13 +108,48 @@ def download_single_file(index):
 
     return False
 
+def prepare_eval_tokens(out_path, eval_tokens, max_seq_len=2048):
+    """
+    Tokenize the start of the val split once and save it as an int32 tensor, for
+    base_train's --eval_set_path. The tokens are the ones the streaming val loader
+    would produce, so val bpb is unchanged; each batch consumes one extra target
+    token, hence the eval_tokens // max_seq_len slack.
+    """
+    import torch
+    from nanochat.tokenizer import get_tokenizer
+    tokenizer = get_tokenizer()
+    bos_token = tokenizer.get_bos_token_id()
+    num_tokens = eval_tokens + eval_tokens // max_seq_len + 1
+    tokens = []
+    for batch in parquets_iter_batched(split="val"):
+        for i in range(0, len(batch), 128): # same tokenizer batches as the dataloader
+            for doc_tokens in tokenizer.encode(batch[i:i+128], prepend=bos_token, num_threads=4):
+                tokens.extend(doc_tokens)
+            if len(tokens) >= num_tokens:
+                break
+        if len(tokens) >= num_tokens:
+            break
+    assert len(tokens) >= num_tokens, f"val split only has {len(tokens):,} tokens, need {num_tokens:,}"
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    torch.save(torch.tensor(tokens[:num_tokens], dtype=torch.int32), out_path + ".tmp")
+    os.rename(out_path + ".tmp", out_path)
+    print(f"Saved {num_tokens:,} val tokens to {out_path}")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Download FineWeb-Edu 100BT dataset shards")
     parser.add_argument("-n", "--num-files", type=int, default=-1, help="Number of shards to download (default: -1), -1 = disable")
     parser.add_argument("-w", "--num-workers", type=int, default=4, help="Number of parallel download workers (default: 4)")
+    parser.add_argument("--prepare-eval", action="store_true", help="Instead of downloading, pre-tokenize the val split into --out")
+    parser.add_argument("--out", type=str, default=os.path.join(base_dir, "eval_tokens.pt"), help="Output path for --prepare-eval")
+    parser.add_argument("--eval-tokens", type=int, default=20*524288, help="Number of val tokens base_train will evaluate on, for --prepare-eval")
+    parser.add_argument("--max-seq-len", type=int, default=2048, help="Sequence length base_train will use, for --prepare-eval")
     args = parser.parse_args()
 
+    if args.prepare_eval:
+        prepare_eval_tokens(args.out, args.eval_tokens, args.max_seq_len)
+        raise SystemExit(0)
+
     num = MAX_SHARD + 1 if args.num_files == -1 else min(args.num_files, MAX_SHARD + 1)
     ids_to_download = list(range(num))
     print(f"Downloading {len(ids_to_download)} shards using {args.num_workers} workers...")
@@ -0,0 +1,134 @@
+#!/bin/bash
+# Helpers shared by the Eve tuners (autotune_eve.sh, autotune_eve_pbt.sh). Sourced, not run.
+
+# Cleanup steps (function names) run when the tuner exits, most recently registered first.
+EXIT_HOOKS=()
+on_exit() {
+  EXIT_HOOKS+=("$1")
+}
+run_exit_hooks() {
+  local i
+  for ((i=${#EXIT_HOOKS[@]}-1; i>=0; i--)); do
+    "${EXIT_HOOKS[i]}" || true
+  done
+}
+trap run_exit_hooks EXIT
+
+# Sets GPU_IDS to the devices trials may run on and NUM_GPUS to their count: the entries of a
+# user-set CUDA_VISIBLE_DEVICES mask (ids or UUIDs), else every GPU nvidia-smi lists, else device 0.
+detect_gpus() {
+  GPU_IDS=()
+  if [[ -n "${CUDA_VISIBLE_DEVICES:-}" ]]; then
+    IFS=',' read -r -a GPU_IDS <<< "${CUDA_VISIBLE_DEVICES// /}"
+  elif command -v nvidia-smi >/dev/null 2>&1; then
+    local n
+    n=$(nvidia-smi --list-gpus | wc -l)
+    for ((n=n-1; n>=0; n--)); do
+      GPU_IDS=("$n" "${GPU_IDS[@]}")
+    done
+  fi
+  (( ${#GPU_IDS[@]} > 0 )) || GPU_IDS=(0)
+  NUM_GPUS=${#GPU_IDS[@]}
+}
+
+# One-time environment, dataset and tokenizer setup shared by every trial. This mirrors the
+# preamble of run10.sh; trials then launch base_train directly so that concurrent trials do not
+# race on tokenizer training or the shared d12 checkpoint directory. Reads SHM_STAGE, EVAL_TOKENS
+# and TRIAL_TRAIN_TOKENS (the most train tokens any single trial reads); sets TRIAL_BASE_DIR (the
+# NANOCHAT_BASE_DIR trials should use) and EVAL_SET_PATH.
+ensure_datasets() {
+  export OMP_NUM_THREADS=1
+  export NANOCHAT_BASE_DIR="${NANOCHAT_BASE_DIR:-$HOME/.cache/nanochat}"
+  mkdir -p "$NANOCHAT_BASE_DIR"
+
+  command -v uv >/dev/null 2>&1 || curl -LsSf https://astral.sh/uv/install.sh | sh
+  [ -d ".venv" ] || uv venv
+  uv sync --extra gpu --extra autotune
+  source .venv/bin/activate
+
+  curl --proto '=https' --tlsv1.2 -sSf https://sh.rustup.rs | sh -s -- -y
+  source "$HOME/.cargo/env"
+  uv run maturin develop --release --manifest-path rustbpe/Cargo.toml
+
+  python -m nanochat.dataset -n 120
+  if [[ ! -f "$NANOCHAT_BASE_DIR/tokenizer/tokenizer.pkl" ]]; then
+    python -m scripts.tok_train --max_chars=200_000_000 --doc_cap=10_000 --vocab_size=65_536
+  fi
+
+  # Tokenize the validation tokens once; every trial then evaluates on this tensor (memory-mapped,
+  # from /dev/shm when staged) instead of re-tokenizing the val shard at each evaluation. The file is
+  # keyed by the val shard, the tokenizer (a hash of tokenizer.pkl, so a retrained vocabulary gets a
+  # fresh file) and the token count, so later runs with the same setup reuse it.
+  local shards=("$NANOCHAT_BASE_DIR"/base_data/*.parquet)
+  local val_shard tokenizer_hash
+  val_shard=$(basename "${shards[-1]}" .parquet)
+  tokenizer_hash=$(sha1sum "$NANOCHAT_BASE_DIR/tokenizer/tokenizer.pkl" | cut -c1-12)
+  local eval_set="$NANOCHAT_BASE_DIR/autotune_eval_${val_shard}_${tokenizer_hash}_${EVAL_TOKENS//_/}.pt"
+  if [[ ! -f "$eval_set" ]]; then
+    python -m nanochat.dataset --prepare-eval --out "$eval_set" --eval-tokens "$EVAL_TOKENS"
+  fi
+  EVAL_SET_PATH="$eval_set"
+
+  # Stage the shards in RAM once so trials do not re-read them from disk whenever the page cache
+  # has been evicted. Trials get a base dir whose base_data lives in /dev/shm; everything else
+  # (tokenizer, checkpoints, report) is symlinked back to the real base dir. Only the leading train
+  # shards a trial can reach plus the val shard (the last one) are copied, and the staging dir is
+  # removed when the tuner exits. If they do not fit in /dev/shm (e.g. Docker's 64MB default),
+  # trials read from disk instead.
+  TRIAL_BASE_DIR="$NANOCHAT_BASE_DIR"
+  if [[ "$SHM_STAGE" == true && -d /dev/shm ]]; then
+    local num_train=$(( ${#shards[@]} - 1 ))
+    # ~4.8 chars/token and ~250M chars/shard (see speedrun.sh), plus a spare shard for the estimate;
+    # staging fewer shards than a trial reads would make its loader wrap around early
+    local num_stage=$(( (${TRIAL_TRAIN_TOKENS//_/} * 48 / 10 + 249999999) / 250000000 + 1 ))
+    (( num_stage < num_train )) || num_stage=$num_train
+    local to_stage=("${shards[@]:0:num_stage}" "${shards[num_train]}")
+    local need avail
+    need=$(du -cbL "${to_stage[@]}" "$eval_set" | tail -n 1 | cut -f 1)
+    avail=$(df --output=avail -B1 /dev/shm | tail -n 1)
+    if (( need > avail )); then
+      echo "[autotune] WARNING: staging needs $((need >> 20))MB but /dev/shm has $((avail >> 20))MB free;" \
+        "trials read the shards from disk (enlarge /dev/shm, e.g. docker run --shm-size, or pass --no-shm-stage)"
+    else
+      SHM_STAGE_DIR="/dev/shm/nanochat_autotune_$$"
+      on_exit remove_shm_stage
+      local shard entry
+      mkdir -p "$SHM_STAGE_DIR/base_data" "$NANOCHAT_BASE_DIR/base_checkpoints" "$NANOCHAT_BASE_DIR/report"
+      for shard in "${to_stage[@]}"; do
+        cp "$shard" "$SHM_STAGE_DIR/base_data/"
+      done
+      cp "$eval_set" "$SHM_STAGE_DIR/"
+      for entry in "$NANOCHAT_BASE_DIR"/*; do
+        # base_data and the eval set are the staged copies
+        [[ -e "$SHM_STAGE_DIR/$(basename "$entry")" ]] || ln -s "$entry" "$SHM_STAGE_DIR/$(basename "$entry")"
+      done
+      EVAL_SET_PATH="$SHM_STAGE_DIR/$(basename "$eval_set")"
+      TRIAL_BASE_DIR="$SHM_STAGE_DIR"
+      echo "[autotune] Staged $num_stage train shards + the val shard in $SHM_STAGE_DIR/base_data (removed on exit)"
+    fi
+  fi
+}
+
+remove_shm_stage() {
+  rm -rf "$SHM_STAGE_DIR"
+}
+
+# Every trial compiles the same depth-12 model, so share one TorchInductor/Triton cache across them
+# (and across both tuners) so that only the first launch pays for compilation.
+setup_compile_cache() {
+  export TORCHINDUCTOR_CACHE_DIR="$BASE_DIR/.autotune_inductor_cache"
+  export TRITON_CACHE_DIR="$BASE_DIR/.autotune_triton_cache"
+  export TORCH_COMPILE_DEBUG=0
+  mkdir -p "$TORCHINDUCTOR_CACHE_DIR" "$TRITON_CACHE_DIR"
+}
+
+# Terminates a trial (or PBT worker), escalating to SIGKILL if it ignores SIGTERM for 30s.
+stop_trial() {
+  local pid="$1"
+  kill -TERM "$pid" 2>/dev/null || return 0
+  for _ in {1..30}; do
+    kill -0 "$pid" 2>/dev/null || return 0
+    sleep 1
+  done
+  kill -KILL "$pid" 2>/dev/null || true
+}
@@ -3,20 +3,41 @@
 
 set -euo pipefail
 
+source "$(dirname "${BASH_SOURCE[0]}")/autotune_common.sh"
+
 PROFILE="h100"
 STAGE1_TRIALS=6
 STAGE1_ITERS=""
+BO_INITIAL=3
+SEED=42
 STAGE2_TRIALS=2
 STAGE2_ITERS=""
 BASELINE_ITERS=""
 EVAL_TOKENS=""
+EVAL_EVERY=""
+MAX_PARALLEL=1
+PRUNE_MARGIN=0.02
+RUNGS="0.25,0.5"
+PLATEAU_EPS=1e-3
+PLATEAU_WINDOW=5
+EXTRAPOLATION_MIN_POINTS="" # empty => derived per trial in watch_trial
+EXTRAPOLATION_CONFIDENCE=0.95
+WARMDOWN_RATIO=0.2 # base_train's default (nanochat/base_schedule.py); trials do not override it
+USE_CACHE=true
+SHM_STAGE=true
+PERSISTENT_WORKER=true
+DEPTH=12
 
 BASE_DIR="$(pwd)"
 REPORT_ROOT="$BASE_DIR/autotune_runs"
 EVE_DIR="$REPORT_ROOT/eve"
 BASELINE_DIR="$REPORT_ROOT/baseline"
 EVE_SUMMARY="$EVE_DIR/summary.tsv"
+EVE_PENDING="$EVE_DIR/pending.tsv"
 BASELINE_SUMMARY="$BASELINE_DIR/summary.tsv"
+CACHE_DIR="$REPORT_ROOT/cache"
+RUNNING_DIR="$REPORT_ROOT/.running" # one pid file per running trial, see stop_running_trials
+EVAL_SET_PATH=""
 
 EVE_DEFAULT_BETA1=0.80
 EVE_DEFAULT_BETA2=0.91
@@ -28,12 +49,25 @@ Usage: bash scripts/autotune_eve.sh [options]
 
 Options:
   --profile (h100|rtx5090)    GPU profile to use (default: h100)
-  --stage1-trials N           Number of random Eve trials in stage 1 (default: 3)
+  --stage1-trials N           Number of Eve search trials in stage 1 (default: 6)
   --stage1-iters N            Iterations per stage 1 Eve trial (default: 5000)
+  --bo-initial N              Space-filling stage 1 trials before Bayesian optimization kicks in (default: 3)
+  --seed N                    Seed for the stage 1 design and the GP proposals (default: 42)
   --stage2-trials N           Number of Eve refinement trials (default: 4)
   --stage2-iters N            Iterations per Eve refinement trial (default: 8000)
   --baseline-iters N          Iterations for the baseline (no Eve) run (default: 5000)
   --eval-tokens N             Tokens used during validation (default: auto per profile)
+  --eval-every N              Steps between validation evaluations (default: auto per profile)
+  --max-parallel N            Trials to run concurrently, one GPU each (default: 1)
+  --prune-margin X            Stop a trial whose bpb at a rung trails the rung leader by this fraction (default: 0.02)
+  --rungs LIST                Comma-separated fractions of a trial's iterations to check for pruning; empty disables (default: 0.25,0.5)
+  --plateau-eps X             Stop a trial once its last --plateau-window validation bpbs span less than this (default: 1e-3)
+  --plateau-window N          Validations considered by the plateau check; 0 disables it (default: 5)
+  --extrapolation-min-points N  Validations before a trial's bpb curve is extrapolated to its LR warmdown start; 0 disables (default: half of the validations before the warmdown, at least 4)
+  --extrapolation-confidence P  Confidence that the extrapolated bpb trails the best finished trial at that step before stopping (default: 0.95)
+  --no-cache                  Re-run trials even if an identical one is cached in autotune_runs/cache
+  --no-shm-stage              Read dataset shards from disk instead of staging them in /dev/shm (low-memory hosts)
+  --no-persistent-worker      Launch a fresh base_train process per trial instead of reusing one worker per GPU
   --help                      Show this message
 EOF
 }
@@ -43,18 +77,35 @@ while [[ $# -gt 0 ]]; do
     --profile) PROFILE="$2"; shift 2;;
     --stage1-trials) STAGE1_TRIALS="$2"; shift 2;;
     --stage1-iters) STAGE1_ITERS="$2"; shift 2;;
+    --bo-initial) BO_INITIAL="$2"; shift 2;;
+    --seed) SEED="$2"; shift 2;;
     --stage2-trials) STAGE2_TRIALS="$2"; shift 2;;
     --stage2-iters) STAGE2_ITERS="$2"; shift 2;;
     --baseline-iters) BASELINE_ITERS="$2"; shift 2;;
     --eval-tokens) EVAL_TOKENS="$2"; shift 2;;
+    --eval-every) EVAL_EVERY="$2"; shift 2;;
+    --max-parallel) MAX_PARALLEL="$2"; shift 2;;
+    --prune-margin) PRUNE_MARGIN="$2"; shift 2;;
+    --rungs) RUNGS="$2"; shift 2;;
+    --plateau-eps) PLATEAU_EPS="$2"; shift 2;;
+    --plateau-window) PLATEAU_WINDOW="$2"; shift 2;;
+    --extrapolation-min-points) EXTRAPOLATION_MIN_POINTS="$2"; shift 2;;
+    --extrapolation-confidence) EXTRAPOLATION_CONFIDENCE="$2"; shift 2;;
+    --no-cache) USE_CACHE=false; shift;;
+    --no-shm-stage) SHM_STAGE=false; shift;;
+    --no-persistent-worker) PERSISTENT_WORKER=false; shift;;
     --help) usage; exit 0;;
     *) echo "Unknown option: $1"; usage; exit 1;;
   esac
 done
 
-mkdir -p "$EVE_DIR" "$BASELINE_DIR"
-printf "stage\ttrial\tbeta1\tbeta2\teta\tmin_bpb\titers\treport_path\n" > "$EVE_SUMMARY"
-printf "stage\ttrial\tbeta1\tbeta2\teta\tmin_bpb\titers\treport_path\n" > "$BASELINE_SUMMARY"
+rm -rf "$RUNNING_DIR"
+mkdir -p "$EVE_DIR" "$BASELINE_DIR" "$CACHE_DIR" "$RUNNING_DIR"
+printf "stage\ttrial\tbeta1\tbeta2\teta\tmin_bpb\titers\tlog_path\tstatus\tfinal_bpb\n" > "$EVE_SUMMARY"
+printf "stage\ttrial\tbeta1\tbeta2\teta\tmin_bpb\titers\tlog_path\tstatus\tfinal_bpb\n" > "$BASELINE_SUMMARY"
+: > "$EVE_PENDING"
+: > "$EVE_DIR/rungs.tsv"
+: > "$BASELINE_DIR/rungs.tsv"
 
 case "$PROFILE" in
   h100)
@@ -64,6 +115,7 @@ case "$PROFILE" in
     PROFILE_STAGE2_ITERS_DEFAULT=512
     PROFILE_BASELINE_ITERS_DEFAULT=256
     PROFILE_EVAL_TOKENS_DEFAULT=98_304
+    PROFILE_EVAL_EVERY_DEFAULT=32
     ;;
   rtx5090)
     PROFILE_DEVICE_BATCH=24
@@ -72,6 +124,7 @@ case "$PROFILE" in
     PROFILE_STAGE2_ITERS_DEFAULT=1024
     PROFILE_BASELINE_ITERS_DEFAULT=512
     PROFILE_EVAL_TOKENS_DEFAULT=49_152
+    PROFILE_EVAL_EVERY_DEFAULT=64
     ;;
   *)
     echo "Unsupported profile: $PROFILE" >&2
@@ -80,40 +133,384 @@ case "$PROFILE" in
 esac
 
 EVAL_TOKENS=${EVAL_TOKENS:-$PROFILE_EVAL_TOKENS_DEFAULT}
+EVAL_EVERY=${EVAL_EVERY:-$PROFILE_EVAL_EVERY_DEFAULT}
 STAGE1_ITERS=${STAGE1_ITERS:-$PROFILE_STAGE1_ITERS_DEFAULT}
 STAGE2_ITERS=${STAGE2_ITERS:-$PROFILE_STAGE2_ITERS_DEFAULT}
 BASELINE_ITERS=${BASELINE_ITERS:-$PROFILE_BASELINE_ITERS_DEFAULT}
 
+detect_gpus
+NUM_SLOTS=$(( MAX_PARALLEL < NUM_GPUS ? MAX_PARALLEL : NUM_GPUS ))
+(( NUM_SLOTS > 0 )) || NUM_SLOTS=1
+# every trial (and persistent worker request) starts its train loader from the first shard
+MAX_ITERS=$(printf "%s\n" "$STAGE1_ITERS" "$STAGE2_ITERS" "$BASELINE_ITERS" | sort -n | tail -n 1)
+TRIAL_TRAIN_TOKENS=$(( MAX_ITERS * ${PROFILE_TOTAL_BATCH//_/} ))
+
 echo "[autotune] Eve sweep configuration:"
 echo "  profile          : $PROFILE"
-echo "  stage1 trials    : $STAGE1_TRIALS (iters=$STAGE1_ITERS)"
+echo "  stage1 trials    : $STAGE1_TRIALS (iters=$STAGE1_ITERS, bo_initial=$BO_INITIAL, seed=$SEED)"
 echo "  stage2 trials    : $STAGE2_TRIALS (iters=$STAGE2_ITERS)"
 echo "  baseline iters   : $BASELINE_ITERS"
-echo "  eval_tokens      : $EVAL_TOKENS"
-
-random_float() {
-  local lo="$1"
-  local hi="$2"
-  python3 - "$lo" "$hi" <<'PY'
-import random, sys
-lo, hi = map(float, sys.argv[1:3])
-print(f"{random.uniform(lo, hi):.6f}")
+echo "  eval_tokens      : $EVAL_TOKENS (every $EVAL_EVERY steps)"
+echo "  pruning          : rungs=${RUNGS:-off} margin=$PRUNE_MARGIN plateau=${PLATEAU_EPS}x${PLATEAU_WINDOW} extrapolation=${EXTRAPOLATION_MIN_POINTS:-auto}@${EXTRAPOLATION_CONFIDENCE}"
+echo "  parallel trials  : $NUM_SLOTS (gpus=${GPU_IDS[*]})"
+
+# Proposes the next stage 1 point as "beta1 beta2 eta". The first BO_INITIAL trials form the initial
+# design: the Eve defaults as an anchor, then a scrambled Sobol sequence (scipy) that covers the box
+# evenly where uniform draws would clump. After that a GP surrogate (scikit-optimize, Expected
+# Improvement) is fit on the stage 1 results so far. Both come from the "autotune" extra; without
+# scikit-optimize the Sobol sequence simply continues, and without scipy either it falls back to
+# seeded uniform draws, with a warning on stderr either way. Pruned and plateau-stopped trials are
+# fit at the best bpb they reached, a pessimistic value (see select_top); failed ones count as inf.
+# Trials still running on other GPUs are told to the GP at the best bpb so far ("constant liar")
+# so that concurrent proposals spread out instead of piling onto the same point.
+suggest_candidate() {
+  python3 - "$EVE_SUMMARY" "$EVE_PENDING" "$BO_INITIAL" "$STAGE1_TRIALS" "$SEED" \
+    "$EVE_DEFAULT_BETA1" "$EVE_DEFAULT_BETA2" "$EVE_DEFAULT_ETA" <<'PY'
+import math, random, sys
+def warn(msg):
+    print(f"[autotune] WARNING: {msg} (install with: uv sync --extra autotune)", file=sys.stderr)
+summary_path, pending_path = sys.argv[1], sys.argv[2]
+n_initial, n_total, seed = map(int, sys.argv[3:6])
+anchor = [float(v) for v in sys.argv[6:9]]
+bounds = [(0.70, 0.88), (0.86, 0.94), (0.8, 1.3)] # beta1, beta2, eta
+
+xs, ys, pending, done = [], [], [], set()
+with open(summary_path) as f:
+    next(f) # header
+    for line in f:
+        stage, trial, beta1, beta2, eta, min_bpb, _, _, status = line.rstrip("\n").split("\t")[:9]
+        if stage == "stage1":
+            done.add(trial)
+            xs.append([float(beta1), float(beta2), float(eta)])
+            ys.append(float("inf") if status == "failed" else float(min_bpb))
+with open(pending_path) as f:
+    for line in f:
+        stage, trial, beta1, beta2, eta = line.rstrip("\n").split("\t")[:5]
+        if stage == "stage1" and trial not in done:
+            pending.append([float(beta1), float(beta2), float(eta)])
+
+try:
+    from skopt import Optimizer
+except ImportError:
+    Optimizer = None
+
+def initial_design(i):
+    if i == 0:
+        return anchor
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        warn("scipy not found, using uniform random draws instead of a Sobol design")
+        rng = random.Random(seed + i)
+        return [rng.uniform(lo, hi) for lo, hi in bounds]
+    # one power-of-two block keeps the sequence balanced; point i is the same on every call
+    u = qmc.Sobol(d=len(bounds), scramble=True, seed=seed).random_base2(m=max(n_total - 1, 1).bit_length())
+    u = u[(i - 1) % len(u)]
+    return [lo + u_k * (hi - lo) for u_k, (lo, hi) in zip(u, bounds)]
+
+finite = [y for y in ys if math.isfinite(y)]
+n_seen = len(xs) + len(pending)
+if Optimizer is None or n_seen < n_initial or not finite:
+    if Optimizer is None and n_seen >= n_initial:
+        warn("scikit-optimize not found, stage 1 continues the initial design instead of Bayesian optimization")
+    point = initial_design(n_seen)
+else:
+    # failed trials report inf; the GP needs finite targets, so pin them to the worst observed bpb
+    worst = max(finite)
+    ys = [y if math.isfinite(y) else worst for y in ys]
+    ys += [min(finite)] * len(pending)
+    opt = Optimizer(bounds, base_estimator="GP", acq_func="EI", n_initial_points=0, random_state=seed)
+    opt.tell(xs + pending, ys)
+    point = opt.ask()
+print(" ".join(f"{v:.6f}" for v in point))
+PY
+}
+
+# Takes summary rows (as printed by select_top) and prints one "trial beta1 beta2 eta" line per row, jittered around
+# that row's point. All rows are drawn in one NumPy call and clipped to the stage 1 search box.
+perturb_candidates() {
+  python3 - "$SEED" "$1" <<'PY'
+import sys
+import numpy as np
+rows = [line.split("\t") for line in sys.argv[2].splitlines() if line.strip()]
+if rows:
+    trials = [row[1] for row in rows]
+    base = np.array([[float(v) for v in row[2:5]] for row in rows])
+    lo, hi = np.array([0.70, 0.86, 0.8]), np.array([0.88, 0.94, 1.3]) # beta1, beta2, eta
+    sigmas = np.array([0.03, 3e-3, 0.15])
+    rng = np.random.default_rng(int(sys.argv[1]))
+    points = np.clip(base + rng.uniform(-sigmas, sigmas, size=base.shape), lo, hi)
+    for trial, point in zip(trials, points):
+        print(trial, *(f"{v:.6f}" for v in point))
 PY
 }
 
+# base_train's validation line, e.g. "Step 00250 | Validation bpb: 1.2345" (groups: step, bpb).
+# Shared by the bash matcher in watch_trial and the awk scan in extract_bpb.
+VAL_BPB_PATTERN='^Step ([0-9]+) [|] Validation bpb: ([0-9.]+)'
+
+# Prints "min_bpb final_bpb" for a trial log ("inf inf" if it has no validation line). The log is
+# streamed through awk, so memory stays constant however long the run was.
 extract_bpb() {
   local source_file="$1"
   if [[ ! -f "$source_file" ]]; then
-    echo "inf"
+    echo "inf inf"
     return
   fi
-  local value
-  value=$(grep -E "Validation bpb" "$source_file" | tail -n 1 | awk -F ":" '{print $NF+0}')
-  if [[ -z "$value" ]]; then
-    echo "inf"
-  else
-    printf "%s" "$value"
+  awk -v pat="$VAL_BPB_PATTERN" '
+    $0 ~ pat {
+      final = $NF + 0
+      if (min == "" || final < min) min = final
+    }
+    END { print (min == "" ? "inf inf" : min " " final) }
+  ' "$source_file"
+}
+
+# Fits bpb(t) = a * t^-b + c to a trial's validation points (space-separated steps and bpbs) and
+# prints "predicted lower" for step `target`: the extrapolated bpb and a one-sided lower bound on it
+# at EXTRAPOLATION_CONFIDENCE, from the fit covariance. The fit has 3 parameters, so the bound uses a
+# Student-t quantile with n-3 degrees of freedom. Prints nothing if the fit fails or scipy is
+# unavailable.
+extrapolate_bpb() {
+  python3 - "$1" "$2" "$3" "$EXTRAPOLATION_CONFIDENCE" <<'PY'
+import sys
+try:
+    import numpy as np
+    from scipy.optimize import curve_fit
+    from scipy.stats import t as student_t
+except ImportError:
+    sys.exit(0)
+target, confidence = float(sys.argv[1]), float(sys.argv[4])
+steps = np.array(sys.argv[2].split(), dtype=float)
+y = np.array(sys.argv[3].split(), dtype=float)
+dof = len(steps) - 3
+if dof < 1:
+    sys.exit(0)
+power_law = lambda t, a, b, c: a * np.power(t, -b) + c
+try:
+    (a, b, c), pcov = curve_fit(power_law, steps, y, p0=(max(y[0] - y[-1], 1e-3), 0.5, y[-1]),
+                                bounds=([0, 0, 0], [np.inf, 5, np.inf]), maxfev=5000)
+except (RuntimeError, ValueError):
+    sys.exit(0)
+# delta method: variance of the prediction at t = target from the parameter covariance
+grad = np.array([target ** -b, -a * target ** -b * np.log(target), 1.0])
+var = grad @ pcov @ grad
+if not np.isfinite(var) or var < 0:
+    sys.exit(0)
+predicted = power_law(target, a, b, c)
+print(f"{predicted:.4f} {predicted - student_t.ppf(confidence, dof) * np.sqrt(var):.4f}")
+PY
+}
+
+# Prints the best validation bpb logged at or before `step` by the full-length trials (status ok or
+# cached) of a stage in summary_file, read from their logs; prints nothing if there is none yet.
+leader_bpb_until() {
+  local summary_file="$1"
+  local stage="$2"
+  local iters="$3"
+  local step="$4"
+  awk -F '\t' -v s="$stage" -v n="$iters" -v until="$step" -v pat="$VAL_BPB_PATTERN" '
+    NR > 1 && $1 == s && $7 == n && ($9 == "ok" || $9 == "cached") {
+      while ((getline line < $8) > 0) {
+        if (line !~ pat) continue
+        split(line, f, " ")
+        if (f[2] + 0 <= until && (m == "" || f[6] + 0 < m)) m = f[6] + 0
+      }
+      close($8)
+    }
+    END { print m }
+  ' "$summary_file"
+}
+
+# Follows a running trial's log and stops it early (ASHA-style): at each rung, the trial's best bpb
+# so far is compared against the best bpb any earlier trial of the same stage had at that rung, and
+# the trial is pruned if it trails by more than PRUNE_MARGIN. Independently of other trials, a run
+# whose last PLATEAU_WINDOW validation bpbs lie within PLATEAU_EPS of each other has stopped
+# improving and is stopped too, keeping its best bpb as the result. Once EXTRAPOLATION_MIN_POINTS
+# validations are in (by default half of those between step 0 and the LR warmdown, so that the
+# check gets several chances even in short stage 1 trials), the curve is extrapolated to the step
+# where the warmdown starts; a trial that would confidently trail the best finished trial of its
+# stage (in summary_file) at that same step is pruned as well. The fit stops short of the warmdown
+# because the power law cannot model its drop, and finished trials' final bpbs include it.
+# The baseline (mode baseline) is the reference every Eve result is compared against, so it always
+# runs through its warmdown: neither the plateau nor the extrapolation check applies to it.
+# Sets TRIAL_STATUS to ok|pruned|plateau (run_trial turns ok into failed on a non-zero exit).
+watch_trial() {
+  local pid="$1"
+  local log_path="$2"
+  local rungs_file="$3"
+  local stage="$4"
+  local iters="$5"
+  local summary_file="$6"
+  local mode="$7"
+
+  local plateau_window="$PLATEAU_WINDOW"
+  [[ "$mode" == "baseline" ]] && plateau_window=0
+  # last step at full LR, as in base_schedule.get_lr_multiplier
+  local warmdown_start
+  warmdown_start=$(awk -v r="$WARMDOWN_RATIO" -v n="$iters" 'BEGIN {printf "%d", n - int(r * n + 0.5)}')
+  # a 3-parameter fit needs at least 4 points for its covariance to be finite
+  local min_points="$EXTRAPOLATION_MIN_POINTS"
+  if [[ -z "$min_points" ]]; then
+    min_points=$(( (warmdown_start - 1) / EVAL_EVERY / 2 ))
+    (( min_points >= 4 )) || min_points=4
   fi
+  [[ "$mode" == "baseline" ]] && min_points=0
+
+  local rung_steps=()
+  local frac
+  for frac in ${RUNGS//,/ }; do
+    rung_steps+=("$(awk -v f="$frac" -v n="$iters" 'BEGIN {printf "%d", f * n}')")
+  done
+
+  local next_rung=0
+  local best=""
+  local window=()
+  local fit_steps=() fit_bpbs=()
+  local fit predicted lower
+  local line step bpb rung leader
+  TRIAL_STATUS="ok"
+  while IFS= read -r line; do
+    [[ "$line" =~ $VAL_BPB_PATTERN ]] || continue
+    step=$((10#${BASH_REMATCH[1]}))
+    bpb="${BASH_REMATCH[2]}"
+    if [[ -z "$best" ]] || awk -v a="$bpb" -v b="$best" 'BEGIN {exit !(a < b)}'; then
+      best="$bpb"
+    fi
+    while (( next_rung < ${#rung_steps[@]} )) && (( step >= rung_steps[next_rung] )); do
+      rung="${rung_steps[next_rung]}"
+      next_rung=$((next_rung + 1))
+      leader=$(awk -F '\t' -v s="$stage" -v r="$rung" '$1 == s && $2 == r && (m == "" || $3 < m) {m = $3} END {print m}' "$rungs_file")
+      printf "%s\t%s\t%s\n" "$stage" "$rung" "$best" >> "$rungs_file"
+      if [[ -n "$leader" ]] && awk -v a="$best" -v b="$leader" -v m="$PRUNE_MARGIN" 'BEGIN {exit !(a > b * (1 + m))}'; then
+        echo "[autotune] Pruning ${stage} trial at step ${step}: bpb=${best} trails rung leader ${leader}"
+        TRIAL_STATUS="pruned"
+        stop_trial "$pid"
+        return
+      fi
+    done
+    if (( plateau_window > 0 )); then
+      window+=("$bpb")
+      (( ${#window[@]} > plateau_window )) && window=("${window[@]:1}")
+      if (( ${#window[@]} == plateau_window )) && (( step < iters )) \
+        && printf "%s\n" "${window[@]}" | awk -v eps="$PLATEAU_EPS" '
+          NR == 1 || $1 < lo {lo = $1} NR == 1 || $1 > hi {hi = $1} END {exit !(hi - lo < eps)}'; then
+        echo "[autotune] Stopping ${stage} trial at step ${step}: bpb plateaued at ${best} over the last ${plateau_window} validations"
+        TRIAL_STATUS="plateau"
+        stop_trial "$pid"
+        return
+      fi
+    fi
+    if (( min_points > 0 && step > 0 && step < warmdown_start )); then
+      fit_steps+=("$step")
+      fit_bpbs+=("$bpb")
+      (( ${#fit_steps[@]} >= min_points )) || continue
+      leader=$(leader_bpb_until "$summary_file" "$stage" "$iters" "$warmdown_start")
+      [[ -n "$leader" ]] || continue
+      fit=$(extrapolate_bpb "$warmdown_start" "${fit_steps[*]}" "${fit_bpbs[*]}")
+      [[ -n "$fit" ]] || continue
+      read -r predicted lower <<< "$fit"
+      if awk -v a="$lower" -v b="$leader" 'BEGIN {exit !(a > b)}'; then
+        echo "[autotune] Pruning ${stage} trial at step ${step}: extrapolated bpb at step ${warmdown_start}=${predicted} (>= ${lower}) trails best finished ${leader}"
+        TRIAL_STATUS="pruned"
+        stop_trial "$pid"
+        return
+      fi
+    fi
+  done < <(tail -n +1 -F --pid="$pid" "$log_path" 2>/dev/null)
+}
+
+# Prints the k rows of a summary file with the lowest min_bpb, best first. One awk pass keeps a
+# sorted buffer of the k best rows instead of sorting the whole file; failed trials (status failed
+# or inf bpb) are skipped, where sort -n would have ranked inf as 0. Rows stopped early (pruned or
+# plateau) rank on the best bpb they reached, which is before the LR warmdown and so not directly
+# comparable to a full run's: it overstates their final bpb, and they rank pessimistically.
+select_top() {
+  local summary_file="$1"
+  local k="$2"
+  awk -F '\t' -v k="$k" '
+    NR > 1 && $6 != "inf" && $9 != "failed" {
+      if (n == k && $6 + 0 >= bpb[n]) next
+      i = (n < k) ? ++n : n
+      while (i > 1 && $6 + 0 < bpb[i - 1]) { bpb[i] = bpb[i - 1]; row[i] = row[i - 1]; i-- }
+      bpb[i] = $6 + 0
+      row[i] = $0
+    }
+    END { for (i = 1; i <= n; i++) print row[i] }
+  ' "$summary_file"
+}
+
+# Completed trials are cached across invocations, keyed on everything that affects the result.
+# Betas/eta are rounded to 4 decimals so near-identical proposals reuse the same run.
+trial_cache_key() {
+  local mode="$1"
+  local beta1="$2"
+  local beta2="$3"
+  local eta="$4"
+  local iters="$5"
+  printf "%s|%.4f|%.4f|%.4f|%s|%s|%s|%s|%s|%s|%s" \
+    "$mode" "$beta1" "$beta2" "$eta" "$iters" "$PROFILE" "$DEPTH" \
+    "$PROFILE_DEVICE_BATCH" "$PROFILE_TOTAL_BATCH" "$EVAL_TOKENS" "$EVAL_EVERY" \
+    | sha256sum | cut -c1-16
+}
+
+# One long-lived scripts.autotune_worker per GPU slot: CUDA init, tokenizer load and model allocation
+# happen once per sweep instead of once per trial. Each worker serves trials on a Unix socket.
+WORKER_PIDS=()
+worker_socket() {
+  echo "${TMPDIR:-/tmp}/autotune_worker_$$_$1.sock"
+}
+
+start_workers() {
+  local g
+  for ((g=0;g<NUM_SLOTS;g++)); do
+    : > "$REPORT_ROOT/worker_$g.log"
+    start_worker "$g"
+  done
+  on_exit stop_workers
+}
+
+# (Re)starts the worker of one slot; a restarted worker appends to the same log.
+start_worker() {
+  local g="$1"
+  rm -f "$(worker_socket "$g")"
+  NANOCHAT_BASE_DIR="$TRIAL_BASE_DIR" CUDA_VISIBLE_DEVICES="${GPU_IDS[g]}" python -m scripts.autotune_worker \
+    --socket_path="$(worker_socket "$g")" \
+    --depth="$DEPTH" \
+    --device_batch_size="$PROFILE_DEVICE_BATCH" \
+    --total_batch_size="$PROFILE_TOTAL_BATCH" \
+    --eval_tokens="$EVAL_TOKENS" \
+    --eval_every="$EVAL_EVERY" \
+    --eval_set_path="$EVAL_SET_PATH" \
+    >> "$REPORT_ROOT/worker_$g.log" 2>&1 &
+  WORKER_PIDS[g]=$!
+}
+
+stop_workers() {
+  kill "${WORKER_PIDS[@]}" 2>/dev/null || true
+  rm -f "${TMPDIR:-/tmp}"/autotune_worker_$$_*.sock
+}
+
+# Sends one trial to the worker on this GPU and waits for it to finish; the worker appends the
+# validation lines to the trial log. SIGTERM (from stop_trial) asks the worker to end the trial
+# early rather than killing the worker. Exits non-zero when the worker reports the trial failed.
+request_worker_trial() {
+  # exec so that the background job's pid (which stop_trial signals) is the python client itself
+  exec python3 - "$(worker_socket "$1")" "${WORKER_PIDS[$1]}" "${@:2}" <<'PY'
+import json, os, signal, socket, sys, time
+sock_path, worker_pid, mode, beta1, beta2, eta, iters, log_path = sys.argv[1:9]
+signal.signal(signal.SIGTERM, lambda *_: open(log_path + ".stop", "w").close())
+while not os.path.exists(sock_path): # the socket appears once the worker has finished loading
+    os.kill(int(worker_pid), 0) # raises if the worker died during startup
+    time.sleep(1)
+request = {"eve": mode == "eve", "eve_beta1": float(beta1), "eve_beta2": float(beta2), "eve_eta": float(eta),
+           "num_iterations": int(iters), "log_path": log_path}
+with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+    s.connect(sock_path)
+    s.sendall((json.dumps(request) + "\n").encode())
+    reply = json.loads(s.makefile().readline())
+sys.exit(1 if reply["status"] == "failed" else 0)
+PY
 }
 
 run_trial() {
@@ -124,6 +521,7 @@ run_trial() {
   local beta2="$5"
   local eta="$6"
   local iters="$7"
+  local gpu="$8"
 
   local target_dir
   local summary_file
@@ -135,108 +533,189 @@ run_trial() {
     summary_file="$BASELINE_SUMMARY"
   fi
 
+  local cache_file
+  cache_file="$CACHE_DIR/$(trial_cache_key "$mode" "$beta1" "$beta2" "$eta" "$iters").tsv"
+  if [[ "$USE_CACHE" == true && -f "$cache_file" ]]; then
+    local cached_bpb cached_log cached_final
+    IFS=$'\t' read -r cached_bpb cached_log cached_final < "$cache_file"
+    printf "%s\t%s\t%.6f\t%.6f\t%.6f\t%s\t%s\t%s\t%s\t%s\n" \
+      "$stage" "$trial" "$beta1" "$beta2" "$eta" "$cached_bpb" "$iters" "$cached_log" "cached" "${cached_final:-inf}" \
+      >> "$summary_file"
+    echo "[autotune][$mode] Stage ${stage} trial ${trial}: cache hit -> min_bpb=${cached_bpb}"
+    return
+  fi
+
   local run_id="${stage}_${trial}_$(date +%H%M%S)"
   local log_dir="$target_dir/$run_id"
   mkdir -p "$log_dir"
 
-  echo "[autotune][$mode] Stage ${stage} trial ${trial}: beta1=$beta1 beta2=$beta2 eta=$eta iters=$iters"
+  echo "[autotune][$mode] Stage ${stage} trial ${trial} (gpu ${GPU_IDS[gpu]}): beta1=$beta1 beta2=$beta2 eta=$eta iters=$iters"
 
-  local args=("$PROFILE")
-  local eve_flags=()
-  if [[ "$mode" == "eve" ]]; then
-    args+=(eve)
-    eve_flags+=("--eve_beta1=$beta1" "--eve_beta2=$beta2" "--eve_eta=$eta")
+  local train_pid train_log
+  local model_tag="autotune_${mode}_${run_id}"
+  if [[ "$PERSISTENT_WORKER" == true ]]; then
+    : > "$log_dir/run.log"
+    # run.log only gets the worker's validation lines; errors end up in the worker's own log
+    train_log="$REPORT_ROOT/worker_$gpu.log"
+    request_worker_trial "$gpu" "$mode" "$beta1" "$beta2" "$eta" "$iters" "$log_dir/run.log" &
+    train_pid=$!
+  else
+    local eve_flags=()
+    if [[ "$mode" == "eve" ]]; then
+      eve_flags+=(--eve=True "--eve_beta1=$beta1" "--eve_beta2=$beta2" "--eve_eta=$eta")
+    fi
+    # Each trial is a single process on one GPU, so run base_train directly rather than through
+    # torchrun: no launcher process or rendezvous, and with RANK unset it takes the non-DDP path.
+    NANOCHAT_BASE_DIR="$TRIAL_BASE_DIR" CUDA_VISIBLE_DEVICES="${GPU_IDS[gpu]}" python -m scripts.base_train \
+      --depth="$DEPTH" \
+      --device_batch_size="$PROFILE_DEVICE_BATCH" \
+      --total_batch_size="$PROFILE_TOTAL_BATCH" \
+      --num_iterations="$iters" \
+      --eval_tokens="$EVAL_TOKENS" \
+      --eval_every="$EVAL_EVERY" \
+      --eval_set_path="$EVAL_SET_PATH" \
+      --core_metric_every=-1 \
+      --sample_every="$iters" \
+      --model_tag="$model_tag" \
+      "${eve_flags[@]}" \
+      --run="$model_tag" \
+      > "$log_dir/run.log" 2>&1 &
+    train_pid=$!
+    train_log="$log_dir/run.log"
   fi
+  echo "$train_pid" > "$RUNNING_DIR/$run_id"
+  watch_trial "$train_pid" "$log_dir/run.log" "$target_dir/rungs.tsv" "$stage" "$iters" "$summary_file" "$mode"
+  local train_rc=0
+  wait "$train_pid" || train_rc=$?
+  rm -f "$RUNNING_DIR/$run_id"
+  # a trial we stopped exits non-zero too, so only an unprompted non-zero exit counts as a failure
+  if [[ "$train_rc" -ne 0 && "$TRIAL_STATUS" == "ok" ]]; then
+    TRIAL_STATUS="failed"
+  fi
+  # only the bpb matters here; drop the trial checkpoint so long sweeps do not fill the disk
+  rm -rf "$NANOCHAT_BASE_DIR/base_checkpoints/$model_tag"
 
-  NO_REPORT=1 WANDB_RUN="autotune_${mode}_${run_id}" \
-    bash run10.sh "${args[@]}" \
-    --device_batch_size="$PROFILE_DEVICE_BATCH" \
-    --total_batch_size="$PROFILE_TOTAL_BATCH" \
-    --iters="$iters" \
-    --eval_tokens="$EVAL_TOKENS" \
-    "${eve_flags[@]}" \
-    > "$log_dir/run.log" 2>&1 || true
-
-  local report_path="$BASE_DIR/report.md"
-  local min_bpb="inf"
+  local min_bpb final_bpb
+  read -r min_bpb final_bpb < <(extract_bpb "$log_dir/run.log")
 
-  if [[ -f "$report_path" ]]; then
-    cp "$report_path" "$log_dir/report.md"
-    min_bpb=$(extract_bpb "$log_dir/report.md")
+  if [[ "$TRIAL_STATUS" == "failed" || "$min_bpb" == "inf" ]]; then
+    echo "[autotune][$mode] WARNING: trial ${stage}/${trial} failed or logged no validation bpb."
+    echo "[autotune][$mode] tail -n 40 $train_log"
+    tail -n 40 "$train_log"
   fi
 
-  if [[ "$min_bpb" == "inf" ]]; then
-    min_bpb=$(extract_bpb "$log_dir/run.log")
+  printf "%s\t%s\t%.6f\t%.6f\t%.6f\t%s\t%s\t%s\t%s\t%s\n" \
+    "$stage" "$trial" "$beta1" "$beta2" "$eta" "$min_bpb" "$iters" "$log_dir/run.log" "$TRIAL_STATUS" "$final_bpb" \
+    >> "$summary_file"
+
+  # pruned trials depend on whatever else ran in the sweep, so only full runs are cached
+  if [[ "$TRIAL_STATUS" == "ok" && "$min_bpb" != "inf" ]]; then
+    printf "%s\t%s\t%s\n" "$min_bpb" "$log_dir/run.log" "$final_bpb" > "$cache_file"
   fi
 
-  if [[ "$min_bpb" == "inf" ]]; then
-    echo "[autotune][$mode] WARNING: no validation bpb found for ${stage}/${trial}."
-    echo "[autotune][$mode] tail -n 40 $log_dir/run.log"
-    tail -n 40 "$log_dir/run.log"
+  echo "[autotune][$mode] Trial ${trial} -> min_bpb=${min_bpb} final_bpb=${final_bpb} (${TRIAL_STATUS})"
+}
+
+# GPU slots are handed out through a FIFO: launching a trial takes a slot (an index into GPU_IDS,
+# blocking while all slots are busy) and the finished trial puts it back.
+GPU_FIFO="$REPORT_ROOT/.gpu_slots"
+rm -f "$GPU_FIFO"
+mkfifo "$GPU_FIFO"
+exec 3<>"$GPU_FIFO"
+rm -f "$GPU_FIFO"
+for ((g=0;g<NUM_SLOTS;g++)); do
+  echo "$g" >&3
+done
+
+acquire_gpu() {
+  local gpu
+  read -r -u 3 gpu
+  echo "$gpu"
+}
+
+TRIAL_PIDS=()
+launch_trial() {
+  local gpu="$1"
+  shift
+  # a worker that died mid-sweep (CUDA fault, OOM kill) would fail every later trial on its slot, so
+  # restart it here, in the main shell, where WORKER_PIDS (and stop_workers) see the new pid
+  if [[ "$PERSISTENT_WORKER" == true ]] && ! kill -0 "${WORKER_PIDS[gpu]}" 2>/dev/null; then
+    echo "[autotune] WARNING: worker on gpu ${GPU_IDS[gpu]} died (see $REPORT_ROOT/worker_$gpu.log), restarting it"
+    start_worker "$gpu"
   fi
+  ( run_trial "$@" "$gpu" || true; echo "$gpu" >&3 ) &
+  TRIAL_PIDS+=("$!")
+}
 
-  printf "%s\t%s\t%.6f\t%.6f\t%.6f\t%s\t%s\t%s\n" \
-    "$stage" "$trial" "$beta1" "$beta2" "$eta" "$min_bpb" "$iters" "$log_dir/report.md" \
-    >> "$summary_file"
+# Trials are background jobs, which ignore SIGINT, so their training processes (base_train, or the
+# client of a persistent worker) are stopped explicitly when the tuner exits for any reason.
+stop_running_trials() {
+  local f stoppers=()
+  for f in "$RUNNING_DIR"/*; do
+    [[ -f "$f" ]] || continue
+    stop_trial "$(< "$f")" &
+    stoppers+=("$!")
+  done
+  (( ${#stoppers[@]} )) && wait "${stoppers[@]}"
+}
 
-  echo "[autotune][$mode] Trial ${trial} -> min_bpb=${min_bpb}"
+# Wait for the launched trials only; a bare `wait` would also block on the persistent workers.
+wait_trials() {
+  (( ${#TRIAL_PIDS[@]} )) && wait "${TRIAL_PIDS[@]}"
+  TRIAL_PIDS=()
 }
 
+ensure_datasets
+
+setup_compile_cache
+
+if [[ "$PERSISTENT_WORKER" == true ]]; then
+  start_workers
+fi
+on_exit stop_running_trials
+
 # Eve Stage 1 exploration
 if (( STAGE1_TRIALS > 0 )); then
-  echo "[autotune] Stage 1 (Eve): random exploration with $STAGE1_TRIALS trials."
+  echo "[autotune] Stage 1 (Eve): Bayesian optimization with $STAGE1_TRIALS trials ($BO_INITIAL random warmup)."
   for ((i=1;i<=STAGE1_TRIALS;i++)); do
-    beta1=$(random_float 0.70 0.88)
-    beta2=$(random_float 0.86 0.94)
-    eta=$(random_float 0.8 1.3)
-    run_trial "eve" "stage1" "$i" "$beta1" "$beta2" "$eta" "$STAGE1_ITERS"
+    gpu=$(acquire_gpu)
+    read -r beta1 beta2 eta < <(suggest_candidate)
+    printf "stage1\t%s\t%s\t%s\t%s\n" "$i" "$beta1" "$beta2" "$eta" >> "$EVE_PENDING"
+    launch_trial "$gpu" "eve" "stage1" "$i" "$beta1" "$beta2" "$eta" "$STAGE1_ITERS"
   done
+  wait_trials
 fi
 
 # Eve Stage 2 refinement
 if (( STAGE2_TRIALS > 0 )); then
   echo "[autotune] Stage 2 (Eve): refining best candidates."
-  best=$(tail -n +2 "$EVE_SUMMARY" | sort -t$'\t' -k6,6n | head -n "$STAGE2_TRIALS")
+  best=$(select_top "$EVE_SUMMARY" "$STAGE2_TRIALS")
   if [[ -z "$best" ]]; then
     echo "[autotune] Stage 2 skipped (no stage1 results found)."
   else
-    echo "$best" | while IFS=$'\t' read -r stage trial beta1 beta2 eta _ _ _; do
-      run_trial "eve" "stage2" "${trial}a" "$beta1" "$beta2" "$eta" "$STAGE2_ITERS"
-    beta1=$(python3 - "$beta1" <<'PY'
-import random, sys
-base = float(sys.argv[1])
-print(f"{base + random.uniform(-0.03, 0.03):.6f}")
-PY
-)
-    beta2=$(python3 - "$beta2" <<'PY'
-import random, sys
-base = float(sys.argv[1])
-print(f"{base + random.uniform(-3e-3, 3e-3):.6f}")
-PY
-)
-    eta=$(python3 - "$eta" <<'PY'
-import random, sys
-base = float(sys.argv[1])
-print(f"{base + random.uniform(-0.15, 0.15):.6f}")
-PY
-)
-      run_trial "eve" "stage2" "${trial}b" "$beta1" "$beta2" "$eta" "$STAGE2_ITERS"
-    done
+    while IFS=$'\t' read -r stage trial beta1 beta2 eta _ _ _; do
+      launch_trial "$(acquire_gpu)" "eve" "stage2" "${trial}a" "$beta1" "$beta2" "$eta" "$STAGE2_ITERS"
+    done <<< "$best"
+    while read -r trial beta1 beta2 eta; do
+      launch_trial "$(acquire_gpu)" "eve" "stage2" "${trial}b" "$beta1" "$beta2" "$eta" "$STAGE2_ITERS"
+    done < <(perturb_candidates "$best")
+    wait_trials
   fi
 fi
 
 # Baseline reference run
 echo "[autotune] Baseline: running single reference without Eve."
-run_trial "baseline" "baseline" "1" "$EVE_DEFAULT_BETA1" "$EVE_DEFAULT_BETA2" "$EVE_DEFAULT_ETA" "$BASELINE_ITERS"
+launch_trial "$(acquire_gpu)" "baseline" "baseline" "1" "$EVE_DEFAULT_BETA1" "$EVE_DEFAULT_BETA2" "$EVE_DEFAULT_ETA" "$BASELINE_ITERS"
+wait_trials
 
 echo
 echo "[autotune] Eve results (best first):"
-awk 'BEGIN {printf "%-8s %-8s %-10s %-10s %-8s %-10s %-8s %s\n", "stage", "trial", "beta1", "beta2", "eta", "min_bpb", "iters", "report_path"}
-{printf "%-8s %-8s %-10s %-10s %-8s %-10s %-8s %s\n", $1, $2, $3, $4, $5, $6, $7, $8}' \
-  < <(tail -n +2 "$EVE_SUMMARY" | sort -t$'\t' -k6,6n)
+awk 'BEGIN {printf "%-8s %-8s %-10s %-10s %-8s %-10s %-10s %-8s %-8s %s\n", "stage", "trial", "beta1", "beta2", "eta", "min_bpb", "final_bpb", "iters", "status", "log_path"}
+{printf "%-8s %-8s %-10s %-10s %-8s %-10s %-10s %-8s %-8s %s\n", $1, $2, $3, $4, $5, $6, $10, $7, $9, $8}' \
+  < <(tail -n +2 "$EVE_SUMMARY" | sort -t$'\t' -k6,6g)
 
 echo
 echo "[autotune] Baseline result:"
-awk 'BEGIN {printf "%-8s %-8s %-10s %-10s %-8s %-10s %-8s %s\n", "stage", "trial", "beta1", "beta2", "eta", "min_bpb", "iters", "report_path"}
-{printf "%-8s %-8s %-10s %-10s %-8s %-10s %-8s %s\n", $1, $2, $3, $4, $5, $6, $7, $8}' \
+awk 'BEGIN {printf "%-8s %-8s %-10s %-10s %-8s %-10s %-10s %-8s %-8s %s\n", "stage", "trial", "beta1", "beta2", "eta", "min_bpb", "final_bpb", "iters", "status", "log_path"}
+{printf "%-8s %-8s %-10s %-10s %-8s %-10s %-10s %-8s %-8s %s\n", $1, $2, $3, $4, $5, $6, $10, $7, $9, $8}' \
   < <(tail -n +2 "$BASELINE_SUMMARY")
@@ -0,0 +1,288 @@
+#!/bin/bash
+# Population-based training (PBT) for Eve hyperparameters. A population of base_train workers trains
+# concurrently (one per GPU) and checkpoints every --pbt-interval steps. At each interval the bottom
+# quartile is stopped, restarted from the best worker's checkpoint, and given perturbed beta1/beta2/eta,
+# so a single run yields both a hyperparameter schedule and a trained model.
+
+set -euo pipefail
+
+source "$(dirname "${BASH_SOURCE[0]}")/autotune_common.sh"
+
+PROFILE="h100"
+POPULATION=""
+ITERS=""
+PBT_INTERVAL=""
+EVAL_TOKENS=""
+SHM_STAGE=true
+DEPTH=12
+
+BASE_DIR="$(pwd)"
+PBT_DIR="$BASE_DIR/autotune_runs/pbt"
+SCHEDULE="$PBT_DIR/schedule.tsv"
+
+# run10.sh's tuned Eve settings seed the first worker; the rest start at random points in the search box
+EVE_SEED_BETA1=0.878661
+EVE_SEED_BETA2=0.903832
+EVE_SEED_ETA=1.120727
+
+usage() {
+  cat <<EOF
+Usage: bash scripts/autotune_eve_pbt.sh [options]
+
+Options:
+  --profile (h100|rtx5090)    GPU profile to use (default: h100)
+  --population N              Number of concurrent workers, at least 2 (default: number of GPUs)
+  --iters N                   Iterations per worker (default: 512 on h100, 1024 on rtx5090)
+  --pbt-interval N            Steps between exploit/explore rounds (default: iters / 8)
+  --eval-tokens N             Tokens used during validation (default: auto per profile)
+  --no-shm-stage              Read dataset shards from disk instead of staging them in /dev/shm (low-memory hosts)
+  --help                      Show this message
+EOF
+}
+
+while [[ $# -gt 0 ]]; do
+  case "$1" in
+    --profile) PROFILE="$2"; shift 2;;
+    --population) POPULATION="$2"; shift 2;;
+    --iters) ITERS="$2"; shift 2;;
+    --pbt-interval) PBT_INTERVAL="$2"; shift 2;;
+    --eval-tokens) EVAL_TOKENS="$2"; shift 2;;
+    --no-shm-stage) SHM_STAGE=false; shift;;
+    --help) usage; exit 0;;
+    *) echo "Unknown option: $1"; usage; exit 1;;
+  esac
+done
+
+case "$PROFILE" in
+  h100)
+    PROFILE_DEVICE_BATCH=48
+    PROFILE_TOTAL_BATCH=98_304
+    PROFILE_ITERS_DEFAULT=512
+    PROFILE_EVAL_TOKENS_DEFAULT=98_304
+    ;;
+  rtx5090)
+    PROFILE_DEVICE_BATCH=24
+    PROFILE_TOTAL_BATCH=49_152
+    PROFILE_ITERS_DEFAULT=1024
+    PROFILE_EVAL_TOKENS_DEFAULT=49_152
+    ;;
+  *)
+    echo "Unsupported profile: $PROFILE" >&2
+    exit 1
+    ;;
+esac
+
+detect_gpus
+
+POPULATION=${POPULATION:-$NUM_GPUS}
+ITERS=${ITERS:-$PROFILE_ITERS_DEFAULT}
+PBT_INTERVAL=${PBT_INTERVAL:-$((ITERS / 8))}
+EVAL_TOKENS=${EVAL_TOKENS:-$PROFILE_EVAL_TOKENS_DEFAULT}
+
+if (( POPULATION < 2 )); then
+  echo "PBT needs a population of at least 2 (got $POPULATION); pass --population." >&2
+  exit 1
+fi
+if (( PBT_INTERVAL <= 0 )); then
+  echo "--pbt-interval must be positive (got $PBT_INTERVAL); pass it explicitly when --iters is below 8." >&2
+  exit 1
+fi
+NUM_EXPLOIT=$(( POPULATION / 4 > 0 ? POPULATION / 4 : 1 ))
+# a worker reads at most ITERS batches (exploited workers resume the leader's loader position)
+TRIAL_TRAIN_TOKENS=$(( ITERS * ${PROFILE_TOTAL_BATCH//_/} ))
+
+mkdir -p "$PBT_DIR"
+printf "step\tworker\tevent\tbeta1\tbeta2\teta\tval_bpb\n" > "$SCHEDULE"
+
+echo "[pbt] Eve population-based training:"
+echo "  profile          : $PROFILE"
+echo "  population       : $POPULATION on gpu(s) ${GPU_IDS[*]}, bottom $NUM_EXPLOIT restarted per round"
+echo "  iters            : $ITERS (interval=$PBT_INTERVAL)"
+echo "  eval_tokens      : $EVAL_TOKENS"
+
+random_params() {
+  python3 - <<'PY'
+import random
+print(f"{random.uniform(0.70, 0.88):.6f} {random.uniform(0.86, 0.94):.6f} {random.uniform(0.8, 1.3):.6f}")
+PY
+}
+
+# The stage 2 perturbation from autotune_eve.sh with widened ranges, clamped to the search box.
+perturb_params() {
+  python3 - "$1" "$2" "$3" <<'PY'
+import random, sys
+beta1, beta2, eta = map(float, sys.argv[1:4])
+beta1 = min(max(beta1 + random.uniform(-0.05, 0.05), 0.70), 0.88)
+beta2 = min(max(beta2 + random.uniform(-0.01, 0.01), 0.86), 0.94)
+eta = min(max(eta + random.uniform(-0.25, 0.25), 0.8), 1.3)
+print(f"{beta1:.6f} {beta2:.6f} {eta:.6f}")
+PY
+}
+
+checkpoint_dir() {
+  echo "$NANOCHAT_BASE_DIR/base_checkpoints/pbt_worker_$1"
+}
+
+checkpoint_meta() {
+  echo "$(checkpoint_dir "$1")/meta_$(printf "%06d" "$2").json"
+}
+
+# Succeeds once a worker has fully written its checkpoint for the given step.
+checkpoint_written() {
+  local meta
+  meta="$(checkpoint_meta "$1" "$2")"
+  # the meta file is written last, but may still be mid-write when we poll
+  [[ -f "$meta" ]] && python3 -c 'import json, sys; json.load(open(sys.argv[1]))' "$meta" 2>/dev/null
+}
+
+# Prints the validation bpb a worker checkpointed at the given step, or inf if it has none. A
+# diverged worker's NaN is reported as inf too: sort -g would rank nan ahead of every number.
+checkpoint_bpb() {
+  local meta
+  meta="$(checkpoint_meta "$1" "$2")"
+  if [[ -f "$meta" ]]; then
+    python3 -c 'import json, math, sys
+try: bpb = float(json.load(open(sys.argv[1]))["val_bpb"])
+except ValueError: bpb = math.inf
+print(bpb if math.isfinite(bpb) else "inf")' "$meta"
+  else
+    echo "inf"
+  fi
+}
+
+WORKER_PID=()
+WORKER_GEN=()
+WORKER_BETA1=()
+WORKER_BETA2=()
+WORKER_ETA=()
+
+launch_worker() {
+  local i="$1"
+  local init_ckpt="$2"
+  local worker_dir="$PBT_DIR/worker_$i"
+  mkdir -p "$worker_dir"
+  rm -rf "$(checkpoint_dir "$i")"
+
+  local init_flags=()
+  if [[ -n "$init_ckpt" ]]; then
+    init_flags+=("--init_ckpt=$init_ckpt")
+  fi
+
+  echo "[pbt] worker $i (gen ${WORKER_GEN[i]}, gpu ${GPU_IDS[i % NUM_GPUS]}): beta1=${WORKER_BETA1[i]} beta2=${WORKER_BETA2[i]} eta=${WORKER_ETA[i]}"
+  # single-process worker: skip torchrun's launcher and rendezvous (RANK unset => non-DDP path)
+  NANOCHAT_BASE_DIR="$TRIAL_BASE_DIR" CUDA_VISIBLE_DEVICES="${GPU_IDS[i % NUM_GPUS]}" python -m scripts.base_train \
+    --depth="$DEPTH" \
+    --device_batch_size="$PROFILE_DEVICE_BATCH" \
+    --total_batch_size="$PROFILE_TOTAL_BATCH" \
+    --num_iterations="$ITERS" \
+    --eval_tokens="$EVAL_TOKENS" \
+    --eval_every="$PBT_INTERVAL" \
+    --eval_set_path="$EVAL_SET_PATH" \
+    --save_every="$PBT_INTERVAL" \
+    --core_metric_every=-1 \
+    --sample_every="$ITERS" \
+    --model_tag="pbt_worker_$i" \
+    --eve=True \
+    "--eve_beta1=${WORKER_BETA1[i]}" \
+    "--eve_beta2=${WORKER_BETA2[i]}" \
+    "--eve_eta=${WORKER_ETA[i]}" \
+    "${init_flags[@]}" \
+    > "$worker_dir/run_${WORKER_GEN[i]}.log" 2>&1 &
+  WORKER_PID[i]=$!
+}
+
+# Workers are background jobs, which ignore SIGINT, so stop them explicitly (all at once) when the
+# coordinator exits for any reason.
+stop_workers() {
+  local pid stoppers=()
+  for pid in "${WORKER_PID[@]}"; do
+    stop_trial "$pid" &
+    stoppers+=("$!")
+  done
+  (( ${#stoppers[@]} )) && wait "${stoppers[@]}"
+}
+
+ensure_datasets
+
+setup_compile_cache
+
+on_exit stop_workers
+for ((i=0;i<POPULATION;i++)); do
+  if (( i == 0 )); then
+    params="$EVE_SEED_BETA1 $EVE_SEED_BETA2 $EVE_SEED_ETA"
+  else
+    params=$(random_params)
+  fi
+  read -r WORKER_BETA1[i] WORKER_BETA2[i] WORKER_ETA[i] <<< "$params"
+  WORKER_GEN[i]=0
+  launch_worker "$i" ""
+  printf "0\t%s\tinit\t%s\t%s\t%s\tinf\n" "$i" "${WORKER_BETA1[i]}" "${WORKER_BETA2[i]}" "${WORKER_ETA[i]}" >> "$SCHEDULE"
+done
+
+for ((step=PBT_INTERVAL; step<ITERS; step+=PBT_INTERVAL)); do
+  # wait until every worker has checkpointed this step (or died trying)
+  while true; do
+    ready=0
+    for ((i=0;i<POPULATION;i++)); do
+      if checkpoint_written "$i" "$step" || ! kill -0 "${WORKER_PID[i]}" 2>/dev/null; then
+        ready=$((ready + 1))
+      fi
+    done
+    (( ready == POPULATION )) && break
+    sleep 10
+  done
+
+  # rank the population by validation bpb at this step (best first)
+  ranked=()
+  while IFS=$'\t' read -r _ i; do
+    ranked+=("$i")
+  done < <(for ((i=0;i<POPULATION;i++)); do printf "%s\t%s\n" "$(checkpoint_bpb "$i" "$step")" "$i"; done | sort -t$'\t' -k1,1g)
+  best="${ranked[0]}"
+  best_bpb=$(checkpoint_bpb "$best" "$step")
+  echo "[pbt] step $step: best worker $best (bpb=$best_bpb)"
+  if [[ "$best_bpb" == "inf" ]]; then
+    echo "[pbt] step $step: no worker has a finite bpb, skipping exploit"
+    continue
+  fi
+
+  # exploit: bottom quartile copies the leader's weights + optimizer state; explore: perturb its hyperparameters
+  for ((r=POPULATION-NUM_EXPLOIT; r<POPULATION; r++)); do
+    i="${ranked[r]}"
+    worker_bpb=$(checkpoint_bpb "$i" "$step")
+    stop_trial "${WORKER_PID[i]}"
+    wait "${WORKER_PID[i]}" 2>/dev/null || true
+
+    init_dir="$PBT_DIR/worker_$i/init"
+    rm -rf "$init_dir"
+    mkdir -p "$init_dir"
+    step_id=$(printf "%06d" "$step")
+    cp "$(checkpoint_dir "$best")"/{model,optim}_"$step_id".pt "$(checkpoint_dir "$best")/meta_$step_id.json" "$init_dir/"
+
+    read -r WORKER_BETA1[i] WORKER_BETA2[i] WORKER_ETA[i] < <(perturb_params "${WORKER_BETA1[best]}" "${WORKER_BETA2[best]}" "${WORKER_ETA[best]}")
+    WORKER_GEN[i]=$((WORKER_GEN[i] + 1))
+    echo "[pbt] step $step: worker $i (bpb=$worker_bpb) restarts from worker $best"
+    launch_worker "$i" "$init_dir"
+    printf "%s\t%s\texploit:%s\t%s\t%s\t%s\t%s\n" "$step" "$i" "$best" "${WORKER_BETA1[i]}" "${WORKER_BETA2[i]}" "${WORKER_ETA[i]}" "$worker_bpb" >> "$SCHEDULE"
+  done
+
+  # checkpoints from earlier rounds are no longer needed by anyone
+  for ((i=0;i<POPULATION;i++)); do
+    for f in "$(checkpoint_dir "$i")"/{model,optim,meta}_*; do
+      [[ -e "$f" ]] || continue
+      f_step=$((10#$(basename "$f" | sed -E 's/^[a-z]+_([0-9]+)\..*/\1/')))
+      if (( f_step < step )); then
+        rm -f "$f"
+      fi
+    done
+  done
+done
+
+wait
+
+echo
+echo "[pbt] Final population (best first):"
+for ((i=0;i<POPULATION;i++)); do
+  printf "%s\t%s\t%s\t%s\t%s\t%s\n" "$(checkpoint_bpb "$i" "$ITERS")" "$i" "${WORKER_BETA1[i]}" "${WORKER_BETA2[i]}" "${WORKER_ETA[i]}" "$(checkpoint_dir "$i")"
+done | sort -t$'\t' -k1,1g | awk -F '\t' 'BEGIN {printf "%-10s %-8s %-10s %-10s %-10s %s\n", "val_bpb", "worker", "beta1", "beta2", "eta", "checkpoint"}
+{printf "%-10s %-8s %-10s %-10s %-10s %s\n", $1, $2, $3, $4, $5, $6}'
+echo "[pbt] Hyperparameter schedule: $SCHEDULE"
@@ -0,0 +1,156 @@
+"""
+Persistent base-training worker for scripts/autotune_eve.sh. Run as:
+
+python -m scripts.autotune_worker --socket_path=/tmp/autotune_worker_0.sock --depth=12
+
+The worker pays for CUDA init, tokenizer load and model allocation once, then serves training
+trials over a Unix socket: one JSON request per connection, e.g.
+{"eve": true, "eve_beta1": 0.8, "eve_beta2": 0.91, "eve_eta": 1.0, "num_iterations": 256, "log_path": "..."}
+Each trial re-initializes the weights and optimizers, trains through base_train's schedules (nanochat/base_schedule.py),
+appends "Step N | Validation bpb: X" lines to log_path and replies with {"min_bpb", "final_bpb", "status"}.
+Creating the file log_path + ".stop" ends the trial early (status "pruned").
+"""
+
+import os
+os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "expandable_segments:True"
+import json
+import socketserver
+from contextlib import nullcontext
+
+import torch
+
+from nanochat.gpt import GPT, GPTConfig
+from nanochat.dataloader import tokenizing_distributed_data_loader, pretokenized_data_loader
+from nanochat.common import compute_init, print0, autodetect_device_type
+from nanochat.tokenizer import get_tokenizer, get_token_bytes
+from nanochat.loss_eval import evaluate_bpb
+from nanochat import base_schedule
+from nanochat.base_schedule import step_optimizers
+
+# -----------------------------------------------------------------------------
+# User settings (fixed for the lifetime of the worker; see base_train.py for their meaning)
+socket_path = "" # Unix socket to serve trials on
+device_type = "" # cuda|cpu|mps (empty => autodetect)
+depth = 12
+max_seq_len = 2048
+device_batch_size = 32
+total_batch_size = 524288
+embedding_lr = base_schedule.embedding_lr
+unembedding_lr = base_schedule.unembedding_lr
+weight_decay = base_schedule.weight_decay
+matrix_lr = base_schedule.matrix_lr
+grad_clip = base_schedule.grad_clip
+warmup_ratio = base_schedule.warmup_ratio
+warmdown_ratio = base_schedule.warmdown_ratio
+final_lr_frac = base_schedule.final_lr_frac
+eval_every = 250
+eval_tokens = 20*524288
+eval_set_path = ""
+eve_eps = 1e-8
+# now allow CLI to override the settings via the configurator lol
+config_keys = [k for k,v in globals().items() if not k.startswith('_') and isinstance(v, (int, float, bool, str))]
+exec(open(os.path.join('nanochat', 'configurator.py')).read()) # overrides from command line or config file
+# -----------------------------------------------------------------------------
+assert socket_path, "--socket_path is required"
+
+# Compute init (single device: the tuner pins each worker to one GPU)
+device_type = autodetect_device_type() if device_type == "" else device_type
+ddp, ddp_rank, ddp_local_rank, ddp_world_size, device = compute_init(device_type)
+assert not ddp, "autotune_worker runs one trial per device, launch it without torchrun"
+autocast_ctx = torch.amp.autocast(device_type=device_type, dtype=torch.bfloat16) if device_type == "cuda" else nullcontext()
+synchronize = torch.cuda.synchronize if device_type == "cuda" else lambda: None
+
+tokenizer = get_tokenizer()
+token_bytes = get_token_bytes(device=device)
+vocab_size = tokenizer.get_vocab_size()
+
+# Model is allocated once; the Eve settings live on its config and are swapped per trial
+model_dim = depth * 64
+num_heads = max(1, (model_dim + 127) // 128)
+model_config_kwargs = dict(sequence_len=max_seq_len, vocab_size=vocab_size, n_layer=depth, n_head=num_heads, n_kv_head=num_heads, n_embd=model_dim, eve_eps=eve_eps)
+with torch.device("meta"):
+    orig_model = GPT(GPTConfig(**model_config_kwargs))
+orig_model.to_empty(device=device)
+model = torch.compile(orig_model, dynamic=False)
+
+tokens_per_fwdbwd = device_batch_size * max_seq_len
+assert total_batch_size % tokens_per_fwdbwd == 0
+grad_accum_steps = total_batch_size // tokens_per_fwdbwd
+eval_steps = eval_tokens // tokens_per_fwdbwd
+print0(f"Worker ready: depth={depth}, grad_accum_steps={grad_accum_steps}, eval_steps={eval_steps}")
+
+if eval_set_path:
+    build_val_loader = lambda: pretokenized_data_loader(device_batch_size, max_seq_len, eval_set_path, device=device)
+else:
+    build_val_loader = lambda: tokenizing_distributed_data_loader(device_batch_size, max_seq_len, split="val", device=device)
+
+def train_once(eve, eve_beta1, eve_beta2, eve_eta, num_iterations, log_path):
+    """One base_train run with the given Eve settings, from freshly initialized weights."""
+    config = orig_model.config
+    config.use_eve, config.eve_beta1, config.eve_beta2, config.eve_eta = bool(eve), eve_beta1, eve_beta2, eve_eta
+    # the Eve scalars are baked into the compiled graph, so start each trial from a clean dynamo cache
+    torch._dynamo.reset()
+    # same seed and data order as a fresh base_train process
+    torch.manual_seed(42)
+    if device_type == "cuda":
+        torch.cuda.manual_seed(42)
+    orig_model.init_weights()
+    optimizers = orig_model.setup_optimizers(unembedding_lr=unembedding_lr, embedding_lr=embedding_lr, matrix_lr=matrix_lr, weight_decay=weight_decay)
+    train_loader = tokenizing_distributed_data_loader(device_batch_size, max_seq_len, split="train", device=device)
+    x, y = next(train_loader)
+
+    stop_path = log_path + ".stop"
+    min_bpb, val_bpb, status = float("inf"), float("inf"), "ok"
+    with open(log_path, "a") as log:
+        for step in range(num_iterations + 1):
+            last_step = step == num_iterations
+            if last_step or step % eval_every == 0:
+                model.eval()
+                val_loader = build_val_loader()
+                with autocast_ctx:
+                    val_bpb = evaluate_bpb(model, val_loader, eval_steps, token_bytes)
+                min_bpb = min(min_bpb, val_bpb)
+                print(f"Step {step:05d} | Validation bpb: {val_bpb:.4f}", file=log, flush=True)
+                model.train()
+            if last_step:
+                break
+            if os.path.exists(stop_path):
+                status = "pruned"
+                break
+
+            synchronize()
+            for micro_step in range(grad_accum_steps):
+                with autocast_ctx:
+                    loss = model(x, y)
+                loss = loss / grad_accum_steps
+                loss.backward()
+                x, y = next(train_loader)
+            lrm = step_optimizers(orig_model, optimizers, step, num_iterations, grad_clip, warmup_ratio, warmdown_ratio, final_lr_frac)
+            if step % 25 == 0:
+                print(f"step {step:05d}/{num_iterations:05d} | loss: {loss.item() * grad_accum_steps:.6f} | lrm: {lrm:.2f}", file=log, flush=True)
+    return {"min_bpb": min_bpb, "final_bpb": val_bpb, "status": status}
+
+class TrialHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        print0(f"Trial request: {request}")
+        try:
+            result = train_once(
+                request.get("eve", True),
+                float(request["eve_beta1"]),
+                float(request["eve_beta2"]),
+                float(request["eve_eta"]),
+                int(request["num_iterations"]),
+                request["log_path"],
+            )
+        except Exception as e: # report the failure to the tuner and keep serving
+            print0(f"Trial failed: {e!r}")
+            result = {"min_bpb": float("inf"), "final_bpb": float("inf"), "status": "failed"}
+        print0(f"Trial result: {result}")
+        self.wfile.write((json.dumps(result) + "\n").encode())
+
+if os.path.exists(socket_path):
+    os.remove(socket_path)
+with socketserver.UnixStreamServer(socket_path, TrialHandler) as server:
+    print0(f"Serving trials on {socket_path}")
+    server.serve_forever()
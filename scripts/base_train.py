@@ -20,12 +20,14 @@ import wandb
 import torch
 
 from nanochat.gpt import GPT, GPTConfig
-from nanochat.dataloader import tokenizing_distributed_data_loader
+from nanochat.dataloader import tokenizing_distributed_data_loader, tokenizing_distributed_data_loader_with_state, pretokenized_data_loader
 from nanochat.common import compute_init, compute_cleanup, print0, DummyWandb, print_banner, get_base_dir, autodetect_device_type
 from nanochat.tokenizer import get_tokenizer, get_token_bytes
-from nanochat.checkpoint_manager import save_checkpoint
+from nanochat.checkpoint_manager import save_checkpoint, load_checkpoint, find_last_step
 from nanochat.loss_eval import evaluate_bpb
 from nanochat.engine import Engine
+from nanochat import base_schedule
+from nanochat.base_schedule import step_optimizers
 from scripts.base_eval import evaluate_model
 print_banner()
 
@@ -44,17 +46,19 @@ target_param_data_ratio = 20 # calculate num_iterations to maintain fixed data:p
 # Optimization
 device_batch_size = 32 # per-device batch size (set to not OOM)
 total_batch_size = 524288 # total desired batch size, in #tokens
-embedding_lr = 0.2 # learning rate for the embedding parameters (Adam)
-unembedding_lr = 0.004 # learning rate for the unembedding parameters (Adam)
-weight_decay = 0.0 # weight decay for the embedding/unembedding parameters (Adam)
-matrix_lr = 0.02 # learning rate for the matrix parameters (Muon)
-grad_clip = 1.0 # gradient clipping value (0.0 = disabled)
-warmup_ratio = 0.0 # ratio of iterations for LR warmup
-warmdown_ratio = 0.2 # ratio of iterations for LR warmdown
-final_lr_frac = 0.0 # final LR is this fraction of the initial LR
+# (defaults shared with the autotune worker, see nanochat/base_schedule.py)
+embedding_lr = base_schedule.embedding_lr # learning rate for the embedding parameters (Adam)
+unembedding_lr = base_schedule.unembedding_lr # learning rate for the unembedding parameters (Adam)
+weight_decay = base_schedule.weight_decay # weight decay for the embedding/unembedding parameters (Adam)
+matrix_lr = base_schedule.matrix_lr # learning rate for the matrix parameters (Muon)
+grad_clip = base_schedule.grad_clip # gradient clipping value (0.0 = disabled)
+warmup_ratio = base_schedule.warmup_ratio # ratio of iterations for LR warmup
+warmdown_ratio = base_schedule.warmdown_ratio # ratio of iterations for LR warmdown
+final_lr_frac = base_schedule.final_lr_frac # final LR is this fraction of the initial LR
 # Evaluation
 eval_every = 250 # every how many steps to evaluate the model for val bpb
 eval_tokens = 20*524288 # number of tokens to evaluate val loss on
+eval_set_path = "" # optional val tokens saved by `python -m nanochat.dataset --prepare-eval` (empty => tokenize the val shard on the fly)
 core_metric_every = 2000 # every how many steps to evaluate the core metric (-1 = disable)
 core_metric_max_per_task = 500 # examples per task in estimating the core metric
 sample_every = 2000 # every how many steps to sample from the model
@@ -62,6 +66,8 @@ log_every = 25 # every how many steps to log training status to stdout
 log_every = 25 # how often to print training status lines
 # Output
 model_tag = "" # optionally override the model tag for the output checkpoint directory name
+save_every = -1 # every how many steps to save a checkpoint (-1 = only at the end)
+init_ckpt = "" # optionally resume model + optimizer state from the latest step in this checkpoint directory
 # Eve forward dynamics
 eve = False
 eve_beta1 = 0.9
@@ -158,33 +164,31 @@ print0(f"Total training FLOPs estimate: {num_flops_per_token * total_tokens:e}")
 optimizers = model.setup_optimizers(unembedding_lr=unembedding_lr, embedding_lr=embedding_lr, matrix_lr=matrix_lr, weight_decay=weight_decay)
 adamw_optimizer, muon_optimizer = optimizers
 
+# Optionally resume from a checkpoint (e.g. population-based training hands a worker another worker's state)
+start_step = 0
+dataloader_state = None
+if init_ckpt:
+    init_step = find_last_step(init_ckpt)
+    model_data, optimizer_data, init_meta = load_checkpoint(init_ckpt, init_step, device, load_optimizer=True)
+    orig_model.load_state_dict(model_data, strict=True)
+    for opt, opt_data in zip(optimizers, optimizer_data):
+        opt.load_state_dict(opt_data)
+    del model_data, optimizer_data
+    start_step = init_meta["step"]
+    # continue the data stream where the checkpointed run left it, rather than re-training on its tokens
+    # (only the master's position is saved, so under DDP the other ranks resume approximately)
+    dataloader_state = init_meta.get("dataloader_state")
+    print0(f"Resumed from {init_ckpt} at step {start_step:,}")
+
 # Initialize the DataLoaders for train/val
 base_dir = get_base_dir()
 tokens_dir = os.path.join(base_dir, "tokenized_data")
-train_loader = tokenizing_distributed_data_loader(device_batch_size, max_seq_len, split="train", device=device)
-build_val_loader = lambda: tokenizing_distributed_data_loader(device_batch_size, max_seq_len, split="val", device=device)
-x, y = next(train_loader) # kick off load of the very first batch of data
-
-# -----------------------------------------------------------------------------
-# Set up hyperparameter schedulers
-
-# Learning rate scheduler
-def get_lr_multiplier(it):
-    warmup_iters = round(warmup_ratio * num_iterations)
-    warmdown_iters = round(warmdown_ratio * num_iterations)
-    if it < warmup_iters:
-        return (it + 1) / warmup_iters
-    elif it <= num_iterations - warmdown_iters:
-        return 1.0
-    else:
-        progress = (num_iterations - it) / warmdown_iters
-        return progress * 1.0 + (1 - progress) * final_lr_frac
-
-# Momentum scheduler for Muon optimizer
-def get_muon_momentum(it):
-    frac = min(it / 300, 1)
-    momentum = (1 - frac) * 0.85 + frac * 0.95
-    return momentum
+train_loader = tokenizing_distributed_data_loader_with_state(device_batch_size, max_seq_len, split="train", device=device, resume_state=dataloader_state)
+if eval_set_path:
+    build_val_loader = lambda: pretokenized_data_loader(device_batch_size, max_seq_len, eval_set_path, device=device)
+else:
+    build_val_loader = lambda: tokenizing_distributed_data_loader(device_batch_size, max_seq_len, split="val", device=device)
+x, y, dataloader_state = next(train_loader) # kick off load of the very first batch of data
 
 # -----------------------------------------------------------------------------
 # Training loop
@@ -193,12 +197,12 @@ smooth_train_loss = 0 # EMA of training loss
 ema_beta = 0.9 # EMA decay factor
 total_training_time = 0 # total wall-clock time of training
 # note that we run +1 steps only so that we can eval and save at the end
-for step in range(num_iterations + 1):
+for step in range(start_step, num_iterations + 1):
     last_step = step == num_iterations
     flops_so_far = num_flops_per_token * total_batch_size * step
 
     # once in a while: evaluate the val bpb (all ranks participate)
-    if last_step or step % eval_every == 0:
+    if last_step or step == start_step or step % eval_every == 0:
         model.eval()
         val_loader = build_val_loader()
         eval_steps = eval_tokens // (device_batch_size * max_seq_len * ddp_world_size)
@@ -252,8 +256,8 @@ for step in range(num_iterations + 1):
             print0(tokenizer.decode(sample[0]))
         model.train()
 
-    # save checkpoint at the end of the run (only on master process)
-    if master_process and last_step:
+    # save checkpoint at the end of the run, and every save_every steps if requested (only on master process)
+    if master_process and (last_step or (save_every > 0 and step > start_step and step % save_every == 0)):
         output_dirname = model_tag if model_tag else f"d{depth}" # e.g. d12
         checkpoint_dir = os.path.join(base_dir, "base_checkpoints", output_dirname)
         save_checkpoint(
@@ -268,6 +272,7 @@ for step in range(num_iterations + 1):
                 "user_config": user_config, # inputs to the training script
                 "device_batch_size": device_batch_size,
                 "max_seq_len": max_seq_len,
+                "dataloader_state": dataloader_state, # position of the next batch (x, y), for resuming
             }
         )
 
@@ -285,21 +290,9 @@ for step in range(num_iterations + 1):
         train_loss = loss.detach() # for logging
         loss = loss / grad_accum_steps # each .backward() is a grad sum => normalize loss here
         loss.backward()
-        x, y = next(train_loader) # prefetch the next batch while the GPU is busy with forward/backward
-    # gradient clipping (TODO possibly experiment with)
-    if grad_clip > 0.0:
-        torch.nn.utils.clip_grad_norm_(orig_model.parameters(), grad_clip)
-    # step the optimizers
-    lrm = get_lr_multiplier(step)
-    for opt in optimizers:
-        for group in opt.param_groups:
-            group["lr"] = group["initial_lr"] * lrm
-    muon_momentum = get_muon_momentum(step)
-    for group in muon_optimizer.param_groups:
-        group["momentum"] = muon_momentum
-    for opt in optimizers:
-        opt.step()
-    model.zero_grad(set_to_none=True)
+        x, y, dataloader_state = next(train_loader) # prefetch the next batch while the GPU is busy with forward/backward
+    # clip, schedule the LR and Muon momentum, step the optimizers
+    lrm = step_optimizers(orig_model, optimizers, step, num_iterations, grad_clip, warmup_ratio, warmdown_ratio, final_lr_frac)
     synchronize()
     t1 = time.time()
     dt = t1 - t0
@@ -0,0 +1,77 @@
+"""
+Test the pretraining dataloaders on CPU, with a stand-in tokenizer and dataset. Example run:
+
+python -m pytest tests/test_dataloader.py -v
+"""
+
+import random
+
+import torch
+import nanochat.dataloader as dataloader
+import nanochat.dataset as dataset
+import nanochat.tokenizer as tokenizer
+
+class FakeTokenizer:
+    """Deterministic stand-in for the BPE tokenizer: a few tokens per document, varying in length."""
+
+    def get_bos_token_id(self):
+        return 0
+
+    def encode(self, texts, prepend=None, num_threads=None):
+        token_lists = []
+        for text in texts:
+            doc_id = int(text.split("_")[1])
+            token_lists.append([prepend] + [doc_id % 1000 + 1] * (doc_id % 7 + 1))
+        return token_lists
+
+def fake_parquets(num_row_groups=20, seed=0):
+    rng = random.Random(seed)
+    row_groups, doc_id = [], 0
+    for _ in range(num_row_groups):
+        num_rows = rng.randint(50, 300)
+        row_groups.append([f"doc_{doc_id + i}" for i in range(num_rows)])
+        doc_id += num_rows
+    def parquets_iter_batched(split, start=0, step=1):
+        yield from row_groups[start::step]
+    return parquets_iter_batched
+
+def patch_data(monkeypatch):
+    parquets_iter_batched = fake_parquets()
+    monkeypatch.setattr(dataloader, "get_tokenizer", lambda: FakeTokenizer())
+    monkeypatch.setattr(dataloader, "parquets_iter_batched", parquets_iter_batched)
+    # prepare_eval_tokens imports the tokenizer lazily
+    monkeypatch.setattr(tokenizer, "get_tokenizer", lambda: FakeTokenizer())
+    monkeypatch.setattr(dataset, "parquets_iter_batched", parquets_iter_batched)
+
+def test_resume_state(monkeypatch):
+    """Resuming from the state yielded with a batch reproduces the stream from that batch on."""
+    patch_data(monkeypatch)
+    B, T = 4, 64
+    loader = dataloader.tokenizing_distributed_data_loader_with_state(B, T, "train", tokenizer_batch_size=32, device="cpu")
+    batches = [next(loader) for _ in range(150)] # more than one pass over the fake dataset
+    for k in [0, 1, 7, 60, 149]:
+        resumed = dataloader.tokenizing_distributed_data_loader_with_state(B, T, "train", tokenizer_batch_size=32, device="cpu", resume_state=batches[k][2])
+        for x, y, state in batches[k:k+5]:
+            x2, y2, state2 = next(resumed)
+            assert torch.equal(x, x2) and torch.equal(y, y2)
+            assert state == state2
+
+def test_loader_without_state(monkeypatch):
+    patch_data(monkeypatch)
+    x, y = next(dataloader.tokenizing_distributed_data_loader(2, 16, "train", device="cpu"))
+    x2, y2, _ = next(dataloader.tokenizing_distributed_data_loader_with_state(2, 16, "train", device="cpu"))
+    assert torch.equal(x, x2) and torch.equal(y, y2)
+
+def test_pretokenized_matches_streaming_val(monkeypatch, tmp_path):
+    """The eval set saved by prepare_eval_tokens yields the same batches as the streaming val loader."""
+    patch_data(monkeypatch)
+    B, T, num_batches = 4, 64, 5
+    path = str(tmp_path / "eval_tokens.pt")
+    dataset.prepare_eval_tokens(path, num_batches * B * T, max_seq_len=T)
+    pretokenized = dataloader.pretokenized_data_loader(B, T, path, device="cpu")
+    streaming = dataloader.tokenizing_distributed_data_loader(B, T, "val", device="cpu")
+    for _ in range(num_batches):
+        x, y = next(pretokenized)
+        x2, y2 = next(streaming)
+        assert x.dtype == x2.dtype and y.dtype == y2.dtype
+        assert torch.equal(x, x2) and torch.equal(y, y2)